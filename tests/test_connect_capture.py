@@ -32,7 +32,7 @@ class TestConnectCapture(unittest.TestCase):
                 
                 # 检查数组维度和数据类型
                 self.assertEqual(len(result.shape), 3, "数组应该是3维的(height, width, 3)")
-                self.assertEqual(result.shape[2], 3, "第三个维度应该是3 (RGB)")
+                self.assertEqual(result.shape[2], 3, "第三个维度应该是3 (BGR)")
                 self.assertEqual(result.dtype, np.uint8, "数组数据类型应该是uint8")
                 
                 # 检查是否为全黑图像
@@ -44,7 +44,7 @@ class TestConnectCapture(unittest.TestCase):
                     print(f"截图形状: {result.shape}, 非零像素数量: {np.sum(result != 0)}")
                     # 保存截图为PNG文件
                     debug_filename = f"debug_capture_attempt_{attempt + 1}.png"
-                    cv2.imwrite(debug_filename, cv2.cvtColor(result, cv2.COLOR_RGB2BGR))
+                    cv2.imwrite(debug_filename, result)
                     print(f"已保存截图: {debug_filename}")
                     return  # 测试通过
                 
@@ -0,0 +1,249 @@
+import socket
+import struct
+import threading
+import unittest
+import zlib
+
+import numpy as np
+
+from vncx import VNCClient
+from vncx.client import _blit
+
+# 32 位小端 BGRA（red_shift=16），大多数 VNC 服务器的默认格式
+PF_32 = struct.pack("!BBBB HHH BBB xxx", 32, 24, 0, 1, 255, 255, 255, 16, 8, 0)
+# 16 位小端 RGB565
+PF_16 = struct.pack("!BBBB HHH BBB xxx", 16, 16, 0, 1, 31, 63, 31, 11, 5, 0)
+
+
+def rect(x, y, w, h, encoding, payload):
+    """打包一个矩形（头部 + 编码数据）"""
+    return struct.pack("!HH HH i", x, y, w, h, encoding) + payload
+
+
+def update(*rects):
+    """打包一条 FramebufferUpdate 消息"""
+    return struct.pack("!B x H", 0, len(rects)) + b"".join(rects)
+
+
+def bgra(rgb):
+    """将 (h, w, 3) RGB 数组编码为 32 位 BGRA 像素数据"""
+    out = np.zeros(rgb.shape[:2] + (4,), dtype=np.uint8)
+    out[:, :, :3] = rgb[:, :, ::-1]
+    return out.tobytes()
+
+
+def solid(h, w, rgb):
+    """生成纯色 (h, w, 3) RGB 数组"""
+    return np.full((h, w, 3), rgb, dtype=np.uint8)
+
+
+class FakeRFBServer:
+    """在本地回环端口上模拟 RFB 3.8 服务器，按顺序用预置消息回复帧缓冲更新请求"""
+
+    def __init__(self, width, height, pixel_format, updates):
+        self.width = width
+        self.height = height
+        self.pixel_format = pixel_format
+        self.updates = list(updates)
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(1)
+        self.port = self.listener.getsockname()[1]
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _recv(self, conn, size):
+        data = b""
+        while len(data) < size:
+            chunk = conn.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("client closed")
+            data += chunk
+        return data
+
+    def _serve(self):
+        conn, _ = self.listener.accept()
+        conn.settimeout(5)
+        try:
+            conn.sendall(b"RFB 003.008\n")
+            self._recv(conn, 12)
+            # 仅提供无认证
+            conn.sendall(b"\x01\x01")
+            self._recv(conn, 1)
+            # ClientInit -> ServerInit
+            self._recv(conn, 1)
+            conn.sendall(struct.pack("!HH", self.width, self.height) + self.pixel_format
+                         + struct.pack("!I", 4) + b"fake")
+            while True:
+                msg_type = self._recv(conn, 1)[0]
+                if msg_type == 2:  # SetEncodings
+                    count = struct.unpack("!xH", self._recv(conn, 3))[0]
+                    self._recv(conn, 4 * count)
+                elif msg_type == 3:  # FramebufferUpdateRequest
+                    self._recv(conn, 9)
+                    conn.sendall(self.updates.pop(0) if self.updates else update())
+                elif msg_type == 4:  # KeyEvent
+                    self._recv(conn, 7)
+                elif msg_type == 5:  # PointerEvent
+                    self._recv(conn, 5)
+                else:
+                    return
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def close(self):
+        self.listener.close()
+        self.thread.join(timeout=5)
+
+
+class TestDecoders(unittest.TestCase):
+    def connect(self, width, height, pixel_format, updates):
+        server = FakeRFBServer(width, height, pixel_format, updates)
+        self.addCleanup(server.close)
+        client = VNCClient("127.0.0.1", server.port, timeout=5)
+        self.addCleanup(client.disconnect)
+        return client
+
+    def test_raw_32bpp(self):
+        """RAW 32 位 BGRA 像素解码为 BGR，增量矩形覆盖到初始帧上"""
+        screen = np.arange(8 * 6 * 3, dtype=np.uint8).reshape(6, 8, 3)
+        client = self.connect(8, 6, PF_32, [
+            update(rect(0, 0, 8, 6, 0, bgra(screen))),
+            update(rect(2, 1, 3, 2, 0, bgra(solid(2, 3, (10, 20, 30))))),
+        ])
+        screen[1:3, 2:5] = (10, 20, 30)
+        result = client.capture_screen()
+        np.testing.assert_array_equal(result, screen[:, :, ::-1])
+
+    def test_raw_16bpp(self):
+        """RAW 16 位 RGB565 像素按 5/6/5 位展开为 BGR"""
+        r5 = np.array([[0, 31], [16, 1]], dtype=np.uint16)
+        g6 = np.array([[63, 0], [32, 1]], dtype=np.uint16)
+        b5 = np.array([[31, 0], [8, 1]], dtype=np.uint16)
+        pixels = ((r5 << 11) | (g6 << 5) | b5).astype("<u2")
+        client = self.connect(2, 2, PF_16, [update(rect(0, 0, 2, 2, 0, pixels.tobytes()))])
+        result = client.capture_screen()
+        expected = np.stack([b5 << 3, g6 << 2, r5 << 3], axis=2).astype(np.uint8)
+        np.testing.assert_array_equal(result, expected)
+
+    def test_copy_rect_from_same_update(self):
+        """CopyRect 的源可以是同一次更新中先到达的矩形，即使不是全屏截图"""
+        client = self.connect(32, 24, PF_32, [
+            update(rect(0, 0, 32, 24, 0, bgra(solid(24, 32, (9, 9, 9))))),
+            update(
+                rect(0, 0, 4, 4, 0, bgra(solid(4, 4, (1, 2, 3)))),
+                rect(10, 10, 4, 4, 1, struct.pack("!HH", 0, 0)),
+            ),
+        ])
+        result = client.capture_region(0, 0, 20, 20)
+        np.testing.assert_array_equal(result[10, 10], [3, 2, 1])
+        np.testing.assert_array_equal(result[13, 13], [3, 2, 1])
+        np.testing.assert_array_equal(result[14, 14], [9, 9, 9])
+
+    def test_zlib_rects_share_stream(self):
+        """两个 ZLIB 矩形共用同一个解压流，第二个矩形依赖第一个的字典"""
+        compressor = zlib.compressobj()
+        first = bgra(solid(4, 4, (50, 60, 70)))
+        second = bgra(solid(4, 4, (50, 60, 70)))
+        first_z = compressor.compress(first) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        second_z = compressor.compress(second) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        client = self.connect(8, 4, PF_32, [
+            update(rect(0, 0, 8, 4, 0, bgra(solid(4, 8, (0, 0, 0))))),
+            update(rect(0, 0, 4, 4, 6, struct.pack("!I", len(first_z)) + first_z)),
+            update(rect(4, 0, 4, 4, 6, struct.pack("!I", len(second_z)) + second_z)),
+        ])
+        client.capture_screen()
+        result = client.capture_screen()
+        np.testing.assert_array_equal(result, solid(4, 8, (70, 60, 50)))
+
+    def test_zero_area_rects(self):
+        """零面积的 RAW / CopyRect / ZLIB 矩形被跳过，且不破坏数据流和 ZLIB 解压流"""
+        compressor = zlib.compressobj()
+        empty_z = compressor.compress(b"") + compressor.flush(zlib.Z_SYNC_FLUSH)
+        pixels_z = compressor.compress(bgra(solid(2, 2, (1, 2, 3)))) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        client = self.connect(4, 2, PF_32, [
+            update(rect(0, 0, 4, 2, 0, bgra(solid(2, 4, (0, 0, 0))))),
+            update(
+                rect(0, 0, 0, 0, 0, b""),
+                rect(1, 1, 0, 3, 1, struct.pack("!HH", 0, 0)),
+                rect(2, 0, 5, 0, 6, struct.pack("!I", len(empty_z)) + empty_z),
+                rect(2, 0, 2, 2, 6, struct.pack("!I", len(pixels_z)) + pixels_z),
+            ),
+        ])
+        result = client.capture_screen()
+        expected = solid(2, 4, (0, 0, 0))
+        expected[:, 2:] = (3, 2, 1)
+        np.testing.assert_array_equal(result, expected)
+
+    def test_caller_edits_do_not_leak_into_framebuffer(self):
+        """修改返回的截图不会影响内部 framebuffer 和后续增量截图"""
+        client = self.connect(8, 6, PF_32, [
+            update(rect(0, 0, 8, 6, 0, bgra(solid(6, 8, (5, 5, 5))))),
+        ])
+        first = client.capture_screen()
+        self.assertIsNot(first, client.framebuffer)
+        first[2:4, 2:4] = 255
+        second = client.capture_screen()
+        np.testing.assert_array_equal(second, solid(6, 8, (5, 5, 5)))
+
+    def test_region_buffers_bounded_and_padding_zeroed(self):
+        """区域缓冲缓存有上限，超出屏幕的部分在复用时也保持为 0"""
+        client = self.connect(8, 6, PF_32, [
+            update(rect(0, 0, 8, 6, 0, bgra(solid(6, 8, (7, 7, 7))))),
+        ])
+        for size in range(1, 21):
+            client.capture_region(0, 0, size, 1)
+        self.assertLessEqual(len(client._region_buf_cache), 16)
+        client.capture_region(0, 0, 4, 4)
+        result = client.capture_region(6, 4, 4, 4)
+        np.testing.assert_array_equal(result[:2, :2], solid(2, 2, (7, 7, 7)))
+        self.assertFalse(result[2:].any() or result[:, 2:].any())
+
+    def test_has_changed(self):
+        """has_changed 按区域比较校验值，framebuffer 未写入时跳过计算"""
+        red = rect(0, 0, 2, 2, 0, bgra(solid(2, 2, (255, 0, 0))))
+        blue = rect(0, 0, 2, 2, 0, bgra(solid(2, 2, (0, 0, 255))))
+        client = self.connect(8, 6, PF_32, [
+            update(rect(0, 0, 8, 6, 0, bgra(solid(6, 8, (0, 0, 0))))),
+            update(red),
+            update(),
+            update(red),
+            update(red),
+            update(blue),
+        ])
+        client.capture_screen()
+        self.assertTrue(client.has_changed())
+        self.assertTrue(client.has_changed())
+        client.capture_screen()
+        self.assertFalse(client.has_changed())
+        client.capture_screen()
+        self.assertFalse(client.has_changed())
+        # 不同区域单独记录校验值
+        client.capture_region(0, 0, 4, 4)
+        self.assertTrue(client.has_changed())
+        # 未检查的截图带来变化后，随后的空增量更新仍应报告与上次检查不同
+        client.capture_screen()
+        client.capture_screen()
+        self.assertTrue(client.has_changed())
+        # 其他区域的截图拉取了变化，本区域的空增量更新同样报告变化
+        client.capture_region(0, 0, 4, 4)
+        self.assertTrue(client.has_changed())
+        client.capture_region(0, 0, 4, 4)
+        self.assertFalse(client.has_changed())
+
+    def test_blit_clips_to_destination(self):
+        """_blit 按目标边界裁剪，返回实际写入的像素数"""
+        dst = np.zeros((5, 5, 3), dtype=np.uint8)
+        src = np.arange(3 * 3 * 3, dtype=np.uint8).reshape(3, 3, 3)
+        self.assertEqual(_blit(dst, src, -1, 3), 4)
+        np.testing.assert_array_equal(dst[0:2, 3:5], src[1:3, 0:2])
+        self.assertFalse(dst[2:].any() or dst[:, :3].any())
+        self.assertEqual(_blit(dst, src, 5, 0), 0)
+        self.assertEqual(_blit(dst, src, 1, 1), 9)
+        np.testing.assert_array_equal(dst[1:4, 1:4], src)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,17 +1,70 @@
 import socket
 import struct
+import zlib
 import numpy as np
 import cv2
 import time
-from typing import Optional, Tuple, Union
+from typing import Dict, Optional, Tuple, Union
 from .protocol import (
     RFB_VERSION_3_8, SECURITY_NONE, SECURITY_VNC_AUTH,
     PixelFormat, pack_client_init, pack_set_pixel_format, 
     pack_set_encodings, pack_framebuffer_update_request,
     pack_key_event, pack_pointer_event,
-    ENCODING_RAW, SERVER_FRAMEBUFFER_UPDATE
+    pack_key_event_into, pack_pointer_event_into,
+    ENCODING_RAW, ENCODING_COPY_RECT, ENCODING_ZLIB, SERVER_FRAMEBUFFER_UPDATE
 )
 
+# VNC 认证密码需要按字节反转位顺序，预先生成查找表供 bytes.translate 使用
+_BITREV_TABLE = bytes(int(f"{i:08b}"[::-1], 2) for i in range(256))
+
+# 预编译的消息结构，避免每次调用重新解析格式字符串
+_UPDATE_HEADER = struct.Struct("!B x H")     # FramebufferUpdate 消息头
+_RECT_HEADER = struct.Struct("!HH HH i")     # 矩形头部
+_U8 = struct.Struct("!B")
+_U16_PAIR = struct.Struct("!HH")             # 宽高 / CopyRect 源坐标
+_U32 = struct.Struct("!I")
+
+# 期望的最小接收缓冲大小，用于减少大帧的 recv 次数
+_RCVBUF_SIZE = 4 * 1024 * 1024
+
+# 按尺寸/区域缓存的条目上限，避免大量不同尺寸导致缓存无限增长
+_CACHE_MAX = 16
+
+
+def _cached_array(cache: Dict[Tuple[int, int], np.ndarray], shape: tuple, dtype, alloc=np.empty) -> np.ndarray:
+    """从按 (height, width) 索引的缓存中取出可复用数组，不存在时用 alloc 分配（缓存满时整体清空）"""
+    key = shape[:2]
+    arr = cache.get(key)
+    if arr is None:
+        if len(cache) >= _CACHE_MAX:
+            cache.clear()
+        arr = alloc(shape, dtype=dtype)
+        cache[key] = arr
+    return arr
+
+
+def _looks_non_black(arr: np.ndarray) -> bool:
+    """判断图像是否非全黑：先抽样探测，抽样全为 0 时再做一次完整检查"""
+    return bool(arr[::128, ::128].any() or arr.any())
+
+
+def _blit(dst: np.ndarray, src: np.ndarray, dst_y: int, dst_x: int) -> int:
+    """将 src 贴到 dst 的 (dst_y, dst_x) 处（坐标可为负或越界，自动裁剪），返回实际写入的像素数"""
+    src_h, src_w = src.shape[:2]
+    dst_h, dst_w = dst.shape[:2]
+    if dst_y >= 0 and dst_x >= 0 and dst_y + src_h <= dst_h and dst_x + src_w <= dst_w:
+        # 常见情况：矩形完全落在目标内，直接整块复制
+        dst[dst_y:dst_y + src_h, dst_x:dst_x + src_w] = src
+        return src_h * src_w
+    start_y = max(dst_y, 0)
+    start_x = max(dst_x, 0)
+    end_y = min(dst_y + src_h, dst_h)
+    end_x = min(dst_x + src_w, dst_w)
+    if start_y >= end_y or start_x >= end_x:
+        return 0
+    dst[start_y:end_y, start_x:end_x] = src[start_y - dst_y:end_y - dst_y, start_x - dst_x:end_x - dst_x]
+    return (end_y - start_y) * (end_x - start_x)
+
 
 class VNCClient:
     """轻量级 VNC 客户端，支持基础的 RFB 协议操作"""
@@ -25,17 +78,40 @@ class VNCClient:
         self.width = 0
         self.height = 0
         self._mouse_pos = (0, 0)  # 跟踪当前鼠标位置
+        # 可复用的键鼠事件缓冲，避免高频操作时反复分配小对象
+        self._ptr_buf = bytearray(6)
+        self._key_buf = bytearray(8)
         self.pixel_format = None
+        self._bgra_code = cv2.COLOR_BGRA2BGR  # 32 位像素转 BGR 使用的 cvtColor 转换码
         self.framebuffer = None
-        self._last_frame = None
         self._frame_updated = False
+        self._had_first_full = False  # 是否已收到完整的全屏帧，之后可使用增量更新
+        self._fb_generation = 0  # framebuffer 每次写入像素后递增
+        # 按 (x, y, width, height) 记录 (framebuffer 代数, 校验值)，在 has_changed() 中按需计算
+        self._frame_hashes: Dict[Tuple[int, int, int, int], Tuple[int, int]] = {}
+        self._last_capture: Optional[Tuple[int, int, int, int]] = None
+        self._frame_changed: Optional[bool] = None  # 尚未计算时为 None
+        # ZLIB 编码在整个连接期间共用一个解压流（RFB 协议要求），仅在断开时 flush
+        self._zlib_inflator = zlib.decompressobj()
+        # 按 (height, width) 缓存区域缓冲，避免每次截图重新分配
+        self._region_buf_cache: Dict[Tuple[int, int], np.ndarray] = {}
+        # 按 (height, width) 缓存像素格式转换的输出缓冲，解码结果写入区域后即可复用
+        self._pixel_out_cache: Dict[Tuple[int, int], np.ndarray] = {}
+        # RGB565 解码使用的 uint16 临时缓冲，同样按尺寸复用
+        self._pixel_scratch_cache: Dict[Tuple[int, int], np.ndarray] = {}
         self._connect()
         
     def _connect(self):
         """连接到 VNC 服务器并进行 RFB 协议握手"""
         # 建立 TCP 连接（带超时）
         self.socket.settimeout(self.timeout)
+        # 接收缓冲需在 connect 前设置才能影响 TCP 窗口缩放；仅在当前值更小时调大，
+        # 设置后系统不再自动调整，且实际值受 net.core.rmem_max 限制
+        if self.socket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF) < _RCVBUF_SIZE:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, _RCVBUF_SIZE)
         self.socket.connect((self.host, self.port))
+        # 关闭 Nagle 算法让小的键鼠事件立即发出
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         # RFB 协议版本握手
         server_version = self._recv_with_timeout(12, "RFB version handshake")
         if not server_version.startswith(b"RFB"):
@@ -43,226 +119,197 @@ class VNCClient:
         # 发送客户端版本
         self.socket.send(RFB_VERSION_3_8)
         # 安全类型协商
-        security_types_length = struct.unpack("!B", self._recv_with_timeout(1, "security types length"))[0]
+        security_types_length = _U8.unpack(self._recv_with_timeout(1, "security types length"))[0]
         if security_types_length == 0:
             # 连接失败
-            reason_length = struct.unpack("!I", self.socket.recv(4))[0]
+            reason_length = _U32.unpack(self.socket.recv(4))[0]
             reason = self.socket.recv(reason_length).decode('utf-8')
             raise Exception(f"Connection failed: {reason}")
         security_types = self._recv_with_timeout(security_types_length, "security types")
         # 选择安全类型（优先选择无认证）
         if SECURITY_NONE in security_types:
-            self.socket.send(struct.pack("!B", SECURITY_NONE))
+            self.socket.send(_U8.pack(SECURITY_NONE))
         elif SECURITY_VNC_AUTH in security_types:
             if not self.password:
                 raise Exception("VNC authentication required but no password provided")
-            self.socket.send(struct.pack("!B", SECURITY_VNC_AUTH))
+            self.socket.send(_U8.pack(SECURITY_VNC_AUTH))
             self._vnc_auth()
         else:
             raise Exception("No supported security type")
         # 检查安全结果（仅对 VNC 认证）
         if SECURITY_VNC_AUTH in security_types and self.password:
-            security_result = struct.unpack("!I", self._recv_with_timeout(4, "security result"))[0]
+            security_result = _U32.unpack(self._recv_with_timeout(4, "security result"))[0]
             if security_result != 0:
                 raise Exception("VNC authentication failed")
         # 客户端初始化
         self.socket.send(pack_client_init(shared=True))
         # 服务器初始化
         server_init = self._recv_with_timeout(24, "server initialization")
-        self.width, self.height = struct.unpack("!HH", server_init[:4])
+        self.width, self.height = _U16_PAIR.unpack_from(server_init, 0)
         # 解析像素格式
         pixel_format_data = server_init[4:20]
         self.pixel_format = PixelFormat.unpack(pixel_format_data)
+        # 根据通道位移确定 32 位像素的内存字节顺序（小端下 red_shift=0 为 RGBA，否则为 BGRA）
+        if self.pixel_format.red_shift < self.pixel_format.blue_shift:
+            self._bgra_code = cv2.COLOR_RGBA2BGR
+        else:
+            self._bgra_code = cv2.COLOR_BGRA2BGR
         # 服务器名称
-        name_length = struct.unpack("!I", server_init[20:24])[0]
+        name_length = _U32.unpack_from(server_init, 20)[0]
         server_name = self._recv_with_timeout(name_length, "server name").decode('utf-8')
         print(f"Connected to VNC server: {server_name} ({self.width}x{self.height})")
         # 设置编码
-        self.socket.send(pack_set_encodings([ENCODING_RAW]))
-        # 初始化 framebuffer
+        # 按优先级声明支持的编码
+        self.socket.send(pack_set_encodings([ENCODING_COPY_RECT, ENCODING_ZLIB, ENCODING_RAW]))
+        # 初始化 framebuffer（独立分配，不与区域缓冲共享）
         self.framebuffer = np.zeros((self.height, self.width, 3), dtype=np.uint8)
-        self._last_frame = self.framebuffer.copy()
+        # 预先分配全屏尺寸的像素转换缓冲，全屏 RAW 更新无需再分配
+        self._get_pixel_out(self.height, self.width)
         # 立即请求一次屏幕更新以获取初始帧
         self._request_initial_frame()
 
     def _vnc_auth(self):
         """处理 VNC 认证 - 按照 RFC 6143 协议使用 DES 加密"""
-        # 接收挑战
+        # VNC 协议 (RFC 6143) 规定使用 DES ECB 模式进行密码验证，使用 pycryptodome 库
+        from Crypto.Cipher import DES
+        # 接收挑战（协议规定固定 16 字节，恰好是 DES 块大小的整数倍，无需填充）
         challenge = self._recv_with_timeout(16, "VNC authentication challenge")
         # VNC 密码需要反转每个字节的位顺序
         password_bytes = self.password.encode('utf-8')[:8].ljust(8, b'\x00')
-        reversed_password = bytes([self._reverse_bits(b) for b in password_bytes])
+        cipher = DES.new(password_bytes.translate(_BITREV_TABLE), DES.MODE_ECB)
         # DES 加密挑战
-        response = self._des_encrypt(challenge, reversed_password)
-        self.socket.send(response)
-    
-    def _reverse_bits(self, byte_val):
-        """反转字节的位顺序"""
-        result = 0
-        for i in range(8):
-            result = (result << 1) | (byte_val & 1)
-            byte_val >>= 1
-        return result
-    
-    def _des_encrypt(self, data, key):
-        """VNC 协议标准的 DES 加密实现"""
-        # VNC 协议 (RFC 6143) 规定使用 DES ECB 模式进行密码验证
-        # 这是标准实现，使用 pycryptodome 库
-        from Crypto.Cipher import DES
-        # 确保数据是 8 字节的倍数
-        if len(data) % 8 != 0:
-            data = data.ljust((len(data) + 7) // 8 * 8, b'\x00')
-        # 创建 DES 加密器
-        cipher = DES.new(key, DES.MODE_ECB)
-        # 加密数据
-        return cipher.encrypt(data)
+        self.socket.sendall(cipher.encrypt(challenge))
         
     def disconnect(self):
         """断开与 VNC 服务器的连接"""
         if self.socket:
             self.socket.close()
+        self._zlib_inflator.flush()
             
     def capture_screen(self) -> np.ndarray:
-        """截取全屏并返回 numpy 数组 (height, width, 3) RGB"""
-        # 添加重试机制，处理服务器初始全黑状态
-        max_retries = 3
-        
-        for attempt in range(max_retries):
-            try:
-                result = self.capture_region(0, 0, self.width, self.height)
-                
-                # 检查是否全黑
-                if np.any(result != 0):
-                    # 有有效数据，更新最后帧并返回
-                    self._last_frame = result.copy()
-                    self._frame_updated = True
-                    return result
-                
-                # 如果是最后一次尝试，使用帧缓冲
-                if attempt == max_retries - 1:
-                    if self._frame_updated and self._last_frame is not None:
-                        # 返回缓存的上一帧
-                        return self._last_frame.copy()
-                    return result
-                
-                # 智能等待：第一次快速重试，后续逐渐增加等待时间
-                wait_time = 0.05 * (attempt + 1)
-                import time
-                time.sleep(wait_time)
-                
-                # 智能触发更新：交替移动鼠标和发送键盘事件
-                if attempt % 2 == 0:
-                    self.mouse_move(10 + attempt * 5, 10 + attempt * 5)
-                else:
-                    # 发送无害的键盘事件（如Shift键）
-                    self.key_press(0xFFE1)  # Shift键
-                    
-            except Exception as e:
-                # 如果发生异常，在最后一次尝试时重新抛出
-                if attempt == max_retries - 1:
-                    raise e
-                # 否则等待并重试
-                import time
-                time.sleep(0.1)
-        
-        return np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        """截取全屏并返回 numpy 数组 (height, width, 3) BGR"""
+        return self.capture_region(0, 0, self.width, self.height)
+    
+    def capture_screen_rgb(self) -> np.ndarray:
+        """截取全屏并返回 numpy 数组 (height, width, 3) RGB（BGR 数据的反转视图，无拷贝）"""
+        return self.capture_screen()[:, :, ::-1]
         
     def capture_region(self, x: int, y: int, width: int, height: int) -> np.ndarray:
-        """截取指定区域并返回 numpy 数组 (height, width, 3) RGB"""
+        """截取指定区域并返回 numpy 数组 (height, width, 3) BGR"""
         if not self.socket:
             raise Exception("Not connected to VNC server")
         
-        # 请求帧缓冲区更新（使用 incremental=True 让服务器知道我们支持增量更新）
-        request = pack_framebuffer_update_request(True, x, y, width, height)
+        full_screen = x == 0 and y == 0 and width == self.width and height == self.height
+        # 收到完整帧之前使用非增量请求，之后只请求变化的区域
+        incremental = self._had_first_full
+        request = pack_framebuffer_update_request(incremental, x, y, width, height)
         self.socket.send(request)
         
         # 接收服务器响应（带超时）
         response = self._recv_with_timeout(4, "framebuffer update response")
-        msg_type, num_rectangles = struct.unpack("!B x H", response)
+        msg_type, num_rectangles = _UPDATE_HEADER.unpack(response)
         
         if msg_type != SERVER_FRAMEBUFFER_UPDATE:
             raise Exception(f"Unexpected message type: {msg_type}")
         
-        region_data = np.zeros((height, width, 3), dtype=np.uint8)
+        # 每个矩形到达后立即写入 framebuffer，后续 CopyRect 可引用同一次更新中已解码的矩形
+        self._apply_rectangles(num_rectangles, "rectangle header")
+        
+        if full_screen:
+            self._had_first_full = True
         
+        # framebuffer 只在内部维护，调用方拿到的是按尺寸复用的输出缓冲，
+        # 对返回数组的修改不会影响后续截图（超出屏幕的部分保持为 0）
+        region_data = self._get_region_buffer(height, width)
+        end_y = min(y + height, self.height)
+        end_x = min(x + width, self.width)
+        if end_y - y < height or end_x - x < width:
+            # 区域超出屏幕时，复用的缓冲可能残留上次同尺寸截图的内容，先清零
+            region_data.fill(0)
+        if y < end_y and x < end_x:
+            region_data[:end_y - y, :end_x - x] = self.framebuffer[y:end_y, x:end_x]
+        
+        # 记录本次截图，变化检测推迟到 has_changed() 调用时
+        self._last_capture = (x, y, width, height)
+        self._frame_changed = None
+        
+        return region_data
+    
+    def _apply_rectangles(self, num_rectangles: int, operation: str):
+        """读取 FramebufferUpdate 中的所有矩形，解码后按屏幕坐标写入 framebuffer"""
         for _ in range(num_rectangles):
             # 读取矩形头部（带超时）
-            rect_header = self._recv_with_timeout(12, "rectangle header")
-            rect_x, rect_y, rect_width, rect_height, encoding = struct.unpack("!HH HH i", rect_header)
-            
-            if encoding == ENCODING_RAW:
-                # RAW 编码：直接读取像素数据
-                if self.pixel_format is None:
-                    raise Exception("Pixel format not initialized - connection may have failed")
-                bytes_per_pixel = self.pixel_format.bits_per_pixel // 8
-                pixel_data_size = rect_width * rect_height * bytes_per_pixel
-                pixel_data = self._recv_with_timeout(pixel_data_size, "pixel data")
-                
-                # 解析像素数据为 RGB
-                pixels = self._parse_raw_pixels(pixel_data, rect_width, rect_height)
-                
-                # 更新区域数据
-                end_y = min(rect_y + rect_height - y, height)
-                end_x = min(rect_x + rect_width - x, width)
-                start_y = max(rect_y - y, 0)
-                start_x = max(rect_x - x, 0)
-                
-                if start_y < end_y and start_x < end_x:
-                    src_start_y = max(y - rect_y, 0)
-                    src_start_x = max(x - rect_x, 0)
-                    src_end_y = src_start_y + (end_y - start_y)
-                    src_end_x = src_start_x + (end_x - start_x)
-                    
-                    region_data[start_y:end_y, start_x:end_x] = pixels[src_start_y:src_end_y, src_start_x:src_end_x]
-            else:
+            rect_header = self._recv_with_timeout(12, operation)
+            rect_x, rect_y, rect_width, rect_height, encoding = _RECT_HEADER.unpack(rect_header)
+            pixels = self._read_rect_pixels(rect_width, rect_height, encoding)
+            if _blit(self.framebuffer, pixels, rect_y, rect_x):
+                self._frame_updated = True
+                self._fb_generation += 1
+    
+    def _read_rect_pixels(self, rect_width: int, rect_height: int, encoding: int) -> np.ndarray:
+        """读取一个矩形的编码数据并返回 (rect_height, rect_width, 3) BGR 数组"""
+        if self.pixel_format is None:
+            raise Exception("Pixel format not initialized - connection may have failed")
+        bytes_per_pixel = self.pixel_format.bits_per_pixel // 8
+        if rect_width == 0 or rect_height == 0:
+            # 零面积矩形：仍需读取编码附带的数据，保持数据流和 ZLIB 解压流同步
+            if encoding == ENCODING_COPY_RECT:
+                self._recv_with_timeout(4, "copy rect source")
+            elif encoding == ENCODING_ZLIB:
+                length = _U32.unpack(self._recv_with_timeout(4, "zlib length"))[0]
+                self._zlib_inflator.decompress(self._recv_with_timeout(length, "zlib data"))
+            elif encoding != ENCODING_RAW:
                 raise Exception(f"Unsupported encoding: {encoding}")
-        
-        # 更新主 framebuffer 并维护帧缓冲
-        if x == 0 and y == 0 and width == self.width and height == self.height:
-            # '全屏更新，直接替换
-            self.framebuffer = region_data.copy()
-            self._last_frame = self.framebuffer.copy()
-            self._frame_updated = True
+            return np.empty((rect_height, rect_width, 3), dtype=np.uint8)
+        if encoding == ENCODING_RAW:
+            # RAW 编码：直接接收到目标数组，避免中间 bytes 拷贝
+            raw = np.empty((rect_height, rect_width, bytes_per_pixel), dtype=np.uint8)
+            self._recv_into_with_timeout(memoryview(raw).cast('B'), "pixel data")
+            return self._parse_raw_pixels(raw)
+        elif encoding == ENCODING_COPY_RECT:
+            # COPY_RECT 编码：从当前 framebuffer 的源位置复制
+            src_x, src_y = _U16_PAIR.unpack(self._recv_with_timeout(4, "copy rect source"))
+            return self.framebuffer[src_y:src_y + rect_height, src_x:src_x + rect_width]
+        elif encoding == ENCODING_ZLIB:
+            # ZLIB 编码：4 字节长度 + 压缩的 RAW 像素，解压流跨矩形持续使用
+            length = _U32.unpack(self._recv_with_timeout(4, "zlib length"))[0]
+            compressed = self._recv_with_timeout(length, "zlib data")
+            data = self._zlib_inflator.decompress(compressed)
+            raw = np.frombuffer(data, dtype=np.uint8).reshape(rect_height, rect_width, bytes_per_pixel)
+            return self._parse_raw_pixels(raw)
         else:
-            # 区域更新，合并到现有帧
-            if self.framebuffer is None:
-                # 初始化framebuffer
-                self.framebuffer = np.zeros((self.height, self.width, 3), dtype=np.uint8)
-                if self._last_frame is None:
-                    self._last_frame = self.framebuffer.copy()
-            
-            end_y = min(y + height, self.height)
-            end_x = min(x + width, self.width)
-            if y < end_y and x < end_x:
-                # 只更新非黑色区域（避免用黑色覆盖有效内容）
-                region_slice = region_data[0:end_y-y, 0:end_x-x]
-                non_black_mask = (region_slice != 0).any(axis=2)
-                
-                if np.any(non_black_mask):
-                    # 只更新非黑色像素
-                    self.framebuffer[y:end_y, x:end_x][non_black_mask] = region_slice[non_black_mask]
-                    # 更新_last_frame以反映此更新
-                    if self._last_frame is not None:
-                        self._last_frame[y:end_y, x:end_x][non_black_mask] = region_slice[non_black_mask]
-                    self._frame_updated = True
-        
-        return region_data
+            raise Exception(f"Unsupported encoding: {encoding}")
+    
+    def _get_pixel_out(self, height: int, width: int) -> np.ndarray:
+        """获取指定尺寸的像素转换输出缓冲（内容仅在下一次同尺寸解码前有效）"""
+        return _cached_array(self._pixel_out_cache, (height, width, 3), np.uint8)
+    
+    def _get_region_buffer(self, height: int, width: int) -> np.ndarray:
+        """获取指定尺寸的可复用区域缓冲（返回的数组会在下次相同尺寸截图时被覆盖）"""
+        return _cached_array(self._region_buf_cache, (height, width, 3), np.uint8, alloc=np.zeros)
     
     def _recv_all(self, size: int) -> bytes:
         """确保接收指定大小的数据（带超时）"""
-        data = b""
+        buf = bytearray(size)
+        self._recv_into(memoryview(buf))
+        return bytes(buf)
+    
+    def _recv_into(self, out_mv: memoryview):
+        """将数据直接接收到给定的 memoryview 中直至填满（带超时）"""
+        size = out_mv.nbytes
+        got = 0
         start_time = time.time()
         
-        while len(data) < size:
+        while got < size:
             # 检查超时
             if time.time() - start_time > self.timeout:
                 raise TimeoutError(f"Receive timeout after {self.timeout} seconds")
             
             try:
-                chunk = self.socket.recv(size - len(data))
-                if not chunk:
+                n = self.socket.recv_into(out_mv[got:], size - got)
+                if n == 0:
                     raise Exception("Connection closed unexpectedly")
-                data += chunk
+                got += n
             except socket.timeout:
                 # 如果recv超时，但总时间还没超时，继续尝试
                 if time.time() - start_time > self.timeout:
@@ -271,8 +318,6 @@ class VNCClient:
             except BlockingIOError:
                 # 非阻塞模式下会抛出这个异常，但我们使用的是阻塞模式
                 continue
-        
-        return data
     
     def _recv_with_timeout(self, size: int, operation: str = "receive") -> bytes:
         """接收指定大小的数据，带超时处理和详细错误信息"""
@@ -283,51 +328,95 @@ class VNCClient:
         except Exception as e:
             raise Exception(f"{operation} failed: {e}")
     
-    def _parse_raw_pixels(self, data: bytes, width: int, height: int) -> np.ndarray:
-        """解析 RAW 像素数据为 RGB 数组"""
-        if self.pixel_format is None:
-            raise Exception("Pixel format not initialized - connection may have failed")
-        bytes_per_pixel = self.pixel_format.bits_per_pixel // 8
+    def _recv_into_with_timeout(self, out_mv: memoryview, operation: str = "receive"):
+        """将数据接收到给定的 memoryview 中，带超时处理和详细错误信息"""
+        try:
+            self._recv_into(out_mv)
+        except TimeoutError:
+            raise TimeoutError(f"{operation} timed out after {self.timeout} seconds")
+        except Exception as e:
+            raise Exception(f"{operation} failed: {e}")
+    
+    def _parse_raw_pixels(self, raw: np.ndarray) -> np.ndarray:
+        """解析 RAW 像素数组 (height, width, bytes_per_pixel) 为 BGR 数组（OpenCV 原生顺序）"""
+        height, width, bytes_per_pixel = raw.shape
         if bytes_per_pixel == 4:  # 32-bit
-            # 直接解析为BGRA格式（很多VNC服务器使用这种格式）
-            pixels_bgra = np.frombuffer(data, dtype=np.uint8).reshape(height, width, 4)
-            # 转换为RGB（丢弃alpha通道）
-            # BGRA -> RGB: 取BGR通道，忽略A通道
-            pixels_rgb = pixels_bgra[:, :, [2, 1, 0]]  # BGR -> RGB
-            return pixels_rgb
+            # 按BGRA格式解析（很多VNC服务器使用这种格式）
+            # 转换为BGR（丢弃alpha通道），输出写入复用的缓冲
+            return cv2.cvtColor(raw, self._bgra_code, dst=self._get_pixel_out(height, width))
         elif bytes_per_pixel == 3:  # 24-bit RGB
-            pixels = np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3)
-            return pixels
+            # 反转通道得到 BGR 视图，写入目标缓冲时完成拷贝
+            return raw[:, :, ::-1]
         elif bytes_per_pixel == 2:  # 16-bit
             # 处理 16-bit 格式
-            pixels_16 = np.frombuffer(data, dtype=np.uint16).reshape(height, width)
-            # 假设是 RGB565 格式
-            r = ((pixels_16 & 0xF800) >> 8).astype(np.uint8)
-            g = ((pixels_16 & 0x07E0) >> 3).astype(np.uint8)  
-            b = ((pixels_16 & 0x001F) << 3).astype(np.uint8)
-            return np.stack([r, g, b], axis=2)
-            
+            pixels_16 = raw.view(np.uint16).reshape(height, width)
+            # 假设是 RGB565 格式，复用同一个临时缓冲逐通道写入预分配的 BGR 输出
+            pixels_bgr = self._get_pixel_out(height, width)
+            channel = _cached_array(self._pixel_scratch_cache, (height, width), np.uint16)
+            np.right_shift(pixels_16, 8, out=channel)
+            np.bitwise_and(channel, 0xF8, out=channel)
+            pixels_bgr[:, :, 2] = channel
+            np.right_shift(pixels_16, 3, out=channel)
+            np.bitwise_and(channel, 0xFC, out=channel)
+            pixels_bgr[:, :, 1] = channel
+            np.left_shift(pixels_16, 3, out=channel)
+            np.bitwise_and(channel, 0xF8, out=channel)
+            pixels_bgr[:, :, 0] = channel
+            return pixels_bgr
         else:
             raise Exception(f"Unsupported pixel format: {bytes_per_pixel} bytes per pixel")
         
     def save_img(self, filename: str):
         """保存当前 framebuffer 为图片文件"""
         if self.framebuffer is not None:
-            cv2.imwrite(filename, cv2.cvtColor(self.framebuffer, cv2.COLOR_RGB2BGR))
+            # framebuffer 已是 BGR，无需颜色转换
+            cv2.imwrite(filename, self.framebuffer)
+    
+    def has_changed(self) -> bool:
+        """最近一次截图的区域与该区域上一次检查时内容是否不同，可据此跳过 OCR、保存等后续处理"""
+        if self._frame_changed is None:
+            if self._last_capture is None:
+                return False
+            key = self._last_capture
+            entry = self._frame_hashes.get(key)
+            if entry is not None and entry[0] == self._fb_generation:
+                # 自该区域上次检查以来 framebuffer 未写入任何像素，无需计算校验值
+                self._frame_changed = False
+            else:
+                frame_hash = self._region_crc(*key)
+                self._frame_changed = entry is None or frame_hash != entry[1]
+                if entry is None and len(self._frame_hashes) >= _CACHE_MAX:
+                    self._frame_hashes.clear()
+                self._frame_hashes[key] = (self._fb_generation, frame_hash)
+        return self._frame_changed
+    
+    def _region_crc(self, x: int, y: int, width: int, height: int) -> int:
+        """计算 framebuffer 中指定区域的 CRC32（单次流式扫描，对位置敏感）"""
+        region = self.framebuffer[y:min(y + height, self.height), x:min(x + width, self.width)]
+        if region.flags.c_contiguous:
+            return zlib.crc32(region)
+        # 非整行宽度的区域逐行累加，避免拷贝
+        crc = 0
+        for row in region:
+            crc = zlib.crc32(row, crc)
+        return crc
     
     def has_valid_frame(self) -> bool:
         """检查是否有有效的帧数据（非全黑）"""
-        return self._frame_updated and self._last_frame is not None and bool(np.any(self._last_frame != 0))
+        return self._frame_updated and self.framebuffer is not None and _looks_non_black(self.framebuffer)
             
     def mouse_move(self, x: int, y: int):
         """移动鼠标到指定坐标"""
         # 更新并发送鼠标位置
         self._mouse_pos = (x, y)
-        pointer_event = pack_pointer_event(0, x, y)
-        self.socket.send(pointer_event)
+        self.socket.sendall(pack_pointer_event_into(self._ptr_buf, 0, x, y))
         
     def mouse_click(self, button: int, sleep_time=50):
-        """点击鼠标按键 (1=左键, 2=中键, 4=右键)"""
+        """点击鼠标按键 (1=左键, 2=中键, 4=右键)，sleep_time<=0 时按下和释放合并为一次发送"""
+        if sleep_time <= 0:
+            x, y = self._mouse_pos
+            self.socket.sendall(pack_pointer_event(button, x, y) + pack_pointer_event(0, x, y))
+            return
         self.mouse_down(button)
         time.sleep(sleep_time / 1000)
         self.mouse_up(button)
@@ -336,44 +425,41 @@ class VNCClient:
         """按下鼠标按键"""
         # 使用当前鼠标位置
         x, y = self._mouse_pos
-        pointer_event = pack_pointer_event(button, x, y)
-        self.socket.send(pointer_event)
+        self.socket.sendall(pack_pointer_event_into(self._ptr_buf, button, x, y))
         
     def mouse_up(self, button: int):
         """释放鼠标按键"""
         # 使用当前鼠标位置
         x, y = self._mouse_pos
-        pointer_event = pack_pointer_event(0, x, y)  # 按键状态为 0 表示释放
-        self.socket.send(pointer_event)
+        # 按键状态为 0 表示释放
+        self.socket.sendall(pack_pointer_event_into(self._ptr_buf, 0, x, y))
         
     def mouse_roll_up(self):
         """鼠标滚轮向上"""
         # 鼠标滚轮向上通常是按钮 8
         x, y = self._mouse_pos
-        self.socket.send(pack_pointer_event(8, x, y))  # 按下
-        self.socket.send(pack_pointer_event(0, x, y))  # 释放
+        # 按下和释放合并为一次发送
+        self.socket.sendall(pack_pointer_event(8, x, y) + pack_pointer_event(0, x, y))
         
     def mouse_roll_down(self):
         """鼠标滚轮向下"""
         # 鼠标滚轮向下通常是按钮 16
         x, y = self._mouse_pos
-        self.socket.send(pack_pointer_event(16, x, y))  # 按下
-        self.socket.send(pack_pointer_event(0, x, y))   # 释放
+        # 按下和释放合并为一次发送
+        self.socket.sendall(pack_pointer_event(16, x, y) + pack_pointer_event(0, x, y))
         
     def key_down(self, key_code: int):
         """按下键盘按键"""
-        key_event = pack_key_event(True, key_code)
-        self.socket.send(key_event)
+        self.socket.sendall(pack_key_event_into(self._key_buf, True, key_code))
         
     def key_up(self, key_code: int):
         """释放键盘按键"""
-        key_event = pack_key_event(False, key_code)
-        self.socket.send(key_event)
+        self.socket.sendall(pack_key_event_into(self._key_buf, False, key_code))
         
     def key_press(self, key_code: int):
         """按下并释放键盘按键"""
-        self.key_down(key_code)
-        self.key_up(key_code)
+        # 按下和释放合并为一次发送
+        self.socket.sendall(pack_key_event(True, key_code) + pack_key_event(False, key_code))
         
     def _request_initial_frame(self):
         """在连接建立后立即请求初始帧，确保第一次截图不是全黑"""
@@ -383,21 +469,12 @@ class VNCClient:
         # 接收并处理服务器响应
         try:
             response = self._recv_with_timeout(4, "initial framebuffer update response")
-            msg_type, num_rectangles = struct.unpack("!B x H", response)
+            msg_type, num_rectangles = _UPDATE_HEADER.unpack(response)
             if msg_type != SERVER_FRAMEBUFFER_UPDATE:
                 return
-            # 处理所有矩形区域
-            for _ in range(num_rectangles):
-                rect_header = self._recv_with_timeout(12, "initial rectangle header")
-                rect_x, rect_y, rect_width, rect_height, encoding = struct.unpack("!HH HH i", rect_header)
-                
-                if encoding == ENCODING_RAW:
-                    if self.pixel_format is None:
-                        # 跳过像素数据（不解析，只为了清空缓冲区）
-                        pixel_data_size = rect_width * rect_height * 4  # 假设32位像素格式
-                    else:
-                        bytes_per_pixel = self.pixel_format.bits_per_pixel // 8
-                        pixel_data_size = rect_width * rect_height * bytes_per_pixel
-                    self._recv_with_timeout(pixel_data_size, "initial pixel data")
+            # 处理所有矩形区域，写入 framebuffer，后续增量更新只需覆盖变化区域
+            self._apply_rectangles(num_rectangles, "initial rectangle header")
+            # 已获得完整帧，后续截图可使用增量更新
+            self._had_first_full = True
         except Exception as e:
             print(f"初始帧请求失败（不影响后续操作）: {e}")
\ No newline at end of file
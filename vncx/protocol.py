@@ -32,6 +32,10 @@ ENCODING_RRE = 2
 ENCODING_HEXTILE = 5
 ENCODING_ZLIB = 6
 
+# 预编译的高频消息结构
+_KEY_EVENT = struct.Struct("!B B xx I")
+_POINTER_EVENT = struct.Struct("!B B HH")
+
 # 像素格式
 class PixelFormat:
     def __init__(self):
@@ -92,10 +96,9 @@ def pack_set_pixel_format(pixel_format: PixelFormat) -> bytes:
 
 def pack_set_encodings(encodings: list) -> bytes:
     """打包设置编码消息"""
-    data = struct.pack("!B x H", CLIENT_SET_ENCODINGS, len(encodings))
-    for encoding in encodings:
-        data += struct.pack("!i", encoding)
-    return data
+    # 一次性按编码数量生成格式串打包，避免逐个拼接 bytes
+    fmt = "!B x H" + "i" * len(encodings)
+    return struct.pack(fmt, CLIENT_SET_ENCODINGS, len(encodings), *encodings)
 
 
 def pack_framebuffer_update_request(incremental: bool, x: int, y: int, width: int, height: int) -> bytes:
@@ -111,9 +114,21 @@ def pack_framebuffer_update_request(incremental: bool, x: int, y: int, width: in
 
 def pack_key_event(down: bool, key: int) -> bytes:
     """打包按键事件"""
-    return struct.pack("!B B xx I", CLIENT_KEY_EVENT, 1 if down else 0, key)
+    return _KEY_EVENT.pack(CLIENT_KEY_EVENT, 1 if down else 0, key)
+
+
+def pack_key_event_into(buf: bytearray, down: bool, key: int) -> bytearray:
+    """将按键事件打包到可复用的 8 字节缓冲中"""
+    _KEY_EVENT.pack_into(buf, 0, CLIENT_KEY_EVENT, 1 if down else 0, key)
+    return buf
 
 
 def pack_pointer_event(buttons: int, x: int, y: int) -> bytes:
     """打包鼠标事件"""
-    return struct.pack("!B B HH", CLIENT_POINTER_EVENT, buttons, x, y)
\ No newline at end of file
+    return _POINTER_EVENT.pack(CLIENT_POINTER_EVENT, buttons, x, y)
+
+
+def pack_pointer_event_into(buf: bytearray, buttons: int, x: int, y: int) -> bytearray:
+    """将鼠标事件打包到可复用的 6 字节缓冲中"""
+    _POINTER_EVENT.pack_into(buf, 0, CLIENT_POINTER_EVENT, buttons, x, y)
+    return buf
\ No newline at end of file